@@ -471,12 +471,12 @@ class PluginDiscoveryService(  # noqa: WPS214 (too many public methods)
         Returns:
             The related plugin references.
         """
-        plugin_types = plugin_types or list(PluginType)
-
-        try:
-            plugin_types.remove(target_plugin.type)
-        except ValueError:
-            pass
+        # build a new list rather than mutate the caller's
+        plugin_types = [
+            plugin_type
+            for plugin_type in (PluginType if plugin_types is None else plugin_types)
+            if plugin_type != target_plugin.type
+        ]
 
         related_plugin_refs = []
 
@@ -1,33 +1,68 @@
 """Module for handling multiple project .yml files."""
 
-import copy
+import fnmatch
 import logging
-from collections import OrderedDict
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 
 import yaml
 from atomicwrites import atomic_write
 
+try:
+    from yaml import CSafeLoader as SafeLoader  # noqa: WPS433
+except ImportError:  # pragma: no cover (PyYAML built without libyaml)
+    from yaml import SafeLoader  # noqa: WPS440, WPS433
+
 logger = logging.getLogger(__name__)
 
 BLANK_SUBFILE = {"plugins": {}, "schedules": []}  # noqa: WPS407
+# upper bound on the threads used to write project files
+MAX_IO_WORKERS = 8
+
+
+def _fast_load(path: Path):
+    """Parse a YAML file using the libyaml-backed loader when available.
+
+    Empty (or comment-only) files parse to an empty mapping rather than `None`.
+    """
+    with open(path, "rb") as yaml_file:
+        return yaml.load(yaml_file, Loader=SafeLoader) or {}  # noqa: S506
+
+
+def _copy_structure(value):
+    """Copy the dicts and lists of a parsed YAML document, sharing its scalar leaves."""
+    if isinstance(value, dict):
+        return {key: _copy_structure(node) for key, node in value.items()}
+    if isinstance(value, list):
+        return [_copy_structure(node) for node in value]
+    return value
+
+
+def _merge_into(base: dict, child: dict) -> None:
+    """Merge a child dict into a base dict in place."""
+    for key, value in child.items():
+        if isinstance(value, dict):
+            # get node or create one
+            _merge_into(base.setdefault(key, {}), value)
+        elif isinstance(value, list):
+            node = base.setdefault(key, [])
+            node.extend(value)
+        else:
+            base[key] = value
 
 
 def deep_merge(parent: dict, children: List[dict]) -> dict:
-    """Deep merge a list of child dicts with a given parent."""
-    base = copy.deepcopy(parent)
+    """Deep merge a list of child dicts with a given parent.
+
+    The parent is left untouched, which matters as it is usually the cached
+    contents of `meltano.yml`.
+    """
+    base = _copy_structure(parent)
     for child in children:
-        for key, value in child.items():
-            if isinstance(value, dict):
-                # get node or create one
-                node = base.setdefault(key, {})
-                base[key] = deep_merge(node, [value])
-            elif isinstance(value, list):
-                node = base.setdefault(key, [])
-                node.extend(value)
-            else:
-                base[key] = value
+        _merge_into(base, child)
     return base
 
 
@@ -42,15 +77,23 @@ class ProjectFiles:  # noqa: WPS214
         """Instantiate ProjectFiles interface from project root and meltano.yml path."""
         self.root = root.resolve()
         self._meltano = None
+        self._meltano_stat = None
         self._meltano_file_path = meltano_file_path.resolve()
-        self._plugin_file_map = {}
+        self._meltano_file_path_str = str(self._meltano_file_path)
+        self._index = self._empty_index()
+        self._loaded_include_paths = None
+        self._blank_files = set()
 
     @property
     def meltano(self):
-        """Return the contents of this projects `meltano.yml`."""
-        if self._meltano is None:
-            with open(self._meltano_file_path) as melt_f:
-                self._meltano = yaml.safe_load(melt_f)
+        """Return the contents of this projects `meltano.yml`.
+
+        The parsed file is cached until `meltano.yml` changes on disk.
+        """
+        meltano_stat = self._meltano_file_stat()
+        if self._meltano is None or meltano_stat != self._meltano_stat:
+            self._meltano = _fast_load(self._meltano_file_path)
+            self._meltano_stat = meltano_stat
         return self._meltano
 
     @property
@@ -61,8 +104,8 @@ class ProjectFiles:  # noqa: WPS214
 
     def load(self) -> dict:
         """Load all project files into a single dict representation."""
-        # meltano file may have changed in another process, so reset cache first
-        self.reset_cache()
+        # meltano file may have changed in another process, which the cached
+        # view of it detects on access
         included_file_contents = self._load_included_files()
         return deep_merge(self.meltano, included_file_contents)
 
@@ -72,52 +115,152 @@ class ProjectFiles:  # noqa: WPS214
         Note: `.update()` will write blank entities for those no longer in use (i.e. contained config on load, but not on save).
         """
         file_dicts = self._split_config_dict(meltano_config)
-        for file_path, contents in file_dicts.items():
-            self._write_file(file_path, contents)
-
-        unused_files = [fl for fl in self.include_paths if str(fl) not in file_dicts]
+        writes = list(file_dicts.items())
+
+        # only consider the files the config was loaded (and indexed) from
+        include_paths = self._loaded_include_paths
+        if include_paths is None:
+            include_paths = self.include_paths
+        unused_files = [
+            fl
+            for fl in include_paths
+            if str(fl) not in file_dicts and fl not in self._blank_files
+        ]
         for unused_file_path in unused_files:
-            self._write_file(unused_file_path, BLANK_SUBFILE)
+            writes.append((unused_file_path, BLANK_SUBFILE))
+
+        # dumping holds the GIL, so only the writes themselves are worth a pool
+        changed = []
+        for file_path, contents in writes:
+            dumped = self._dump_if_changed(file_path, contents)
+            if dumped is not None:
+                changed.append((file_path, dumped))
+
+        if len(changed) > 1:
+            max_workers = min(MAX_IO_WORKERS, len(changed))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # consume the results to surface any write errors
+                list(executor.map(lambda write: self._write_file(*write), changed))
+        else:
+            for file_path, dumped in changed:
+                self._write_file(file_path, dumped)
         self.reset_cache()
         return meltano_config
 
     def reset_cache(self):
         """Reset cached view of the meltano.yml file."""
         self._meltano = None
+        self._meltano_stat = None
 
-    def _is_valid_include_path(self, file_path: Path):
-        """Determine if given path is a valid `include_paths` file."""
-        if not (file_path.is_file() and file_path.exists()):
+    def _meltano_file_stat(self) -> tuple:
+        """Return the `meltano.yml` stat fields that change whenever it is rewritten."""
+        meltano_stat = os.stat(self._meltano_file_path)
+        return (meltano_stat.st_ino, meltano_stat.st_mtime_ns, meltano_stat.st_size)
+
+    def _is_valid_include_path(self, file_path: Path, is_file: Optional[bool] = None):
+        """Determine if given path is a valid `include_paths` file.
+
+        `is_file` may be passed when already known, to save a `stat` call.
+        """
+        if is_file is None:
+            is_file = file_path.is_file()
+        if not is_file:
             raise InvalidIncludePath(f"Included path '{file_path}' not found.")
 
     def _resolve_include_paths(self, include_path_patterns: List[str]) -> List[Path]:
         """Return a list of paths from a list of glob pattern strings, not including `meltano.yml` (even if it is matched by a pattern)."""
-        include_paths = []
+        # dict keys double as an insertion-ordered set, deduplicating entries
+        include_paths = {}
         for pattern in include_path_patterns:
-            for path in self.root.glob(pattern):
+            paths = self._try_shallow_glob(pattern)
+            if paths is None:
+                paths = ((path, None) for path in self.root.glob(pattern))
+            for path, is_file in paths:
+                if path == self._meltano_file_path or path in include_paths:
+                    continue
                 try:
-                    self._is_valid_include_path(path)
+                    self._is_valid_include_path(path, is_file=is_file)
                 except InvalidIncludePath as err:
                     logger.critical(f"Include path '{path}' is invalid: \n {err}")
                     raise err
-                include_paths.append(path)
-            if self._meltano_file_path in include_paths:
-                include_paths.remove(self._meltano_file_path)
-
-        # Deduplicate entries
-        return list(OrderedDict.fromkeys(include_paths))
-
-    def _add_to_index(self, key: tuple, include_path: Path) -> None:
-        """Add a new key:path to the `_plugin_file_map`."""
-        if key in self._plugin_file_map:
-            key_path_string = ":".join(key)
-            existing_key_file_path = self._plugin_file_map.get(key)
+                include_paths[path] = None
+        return list(include_paths)
+
+    def _try_shallow_glob(self, pattern: str) -> Optional[List[Tuple[Path, bool]]]:
+        """Resolve a pattern with a single wildcard path segment using one `os.scandir`.
+
+        Include path patterns are overwhelmingly of the `plugins/*/meltano.yml`
+        or `plugins/*.yml` shape, for which `Path.glob` is needlessly expensive.
+
+        Args:
+            pattern: An include path glob pattern, relative to the project root.
+
+        Returns:
+            The matched paths in directory order, each paired with whether it is a
+            regular file, or `None` if the pattern is not of that shape and should
+            be resolved with `Path.glob` instead.
+        """
+        if not pattern or pattern.endswith(("/", os.sep)):
+            return None
+        pattern_path = Path(pattern)
+        if pattern_path.anchor:
+            return None
+
+        parts = pattern_path.parts
+        wildcard_indices = [idx for idx, part in enumerate(parts) if "*" in part]
+        if len(wildcard_indices) != 1:
+            return None
+        if any(char in pattern for char in "?[") or "**" in pattern:
+            return None
+
+        wildcard_idx = wildcard_indices[0]
+        wildcard = parts[wildcard_idx]
+        parent = self.root.joinpath(*parts[:wildcard_idx])
+        suffix = parts[wildcard_idx + 1 :]
+
+        paths = []
+        try:
+            with os.scandir(parent) as entries:
+                for entry in entries:
+                    if not fnmatch.fnmatch(entry.name, wildcard):
+                        continue
+                    if not suffix:
+                        paths.append((parent / entry.name, entry.is_file()))
+                        continue
+                    if not entry.is_dir():
+                        continue
+                    path = parent.joinpath(entry.name, *suffix)
+                    try:
+                        path_stat = os.stat(path)
+                    except OSError:
+                        continue
+                    paths.append((path, stat.S_ISREG(path_stat.st_mode)))
+        except OSError:
+            # unreadable or missing directories match nothing, as with `Path.glob`
+            return []
+        return paths
+
+    @staticmethod
+    def _empty_index() -> dict:
+        """Return an empty index of plugins/schedules/environments to their files.
+
+        Plugins are indexed as `["plugins"][plugin_type][name]`, schedules and
+        environments as `["schedules"][name]` and `["environments"][name]`.
+        """
+        return {"plugins": {}, "schedules": {}, "environments": {}}
+
+    @staticmethod
+    def _add_to_index(
+        file_map: dict, key_prefix: str, name: str, include_path: str
+    ) -> None:
+        """Add a new name:path to one of the `_index` file maps."""
+        if name in file_map:
+            existing_key_file_path = file_map[name]
             logger.critical(
-                f'Plugin with path "{key_path_string}" already added in file {existing_key_file_path}.'
+                f'Plugin with path "{key_prefix}:{name}" already added in file {existing_key_file_path}.'
             )
             raise Exception("Duplicate plugin name found.")
-        else:
-            self._plugin_file_map.update({key: str(include_path)})
+        file_map[name] = include_path
 
     def _index_file(  # noqa: WPS210
         self, include_file_path: Path, include_file_contents: dict
@@ -126,99 +269,140 @@ class ProjectFiles:  # noqa: WPS214
 
         This allows us to know exactly which plugin is configured where when we come to update plugins.
         """
+        # every entry shares the one path string, rather than holding its own copy
+        include_path = str(include_file_path)
         # index plugins
-        all_plugins = include_file_contents.get("plugins", {})
-        for plugin_type, plugins in all_plugins.items():
-            for plugin in plugins:
-                plugin_key = ("plugins", plugin_type, plugin["name"])
-                self._add_to_index(key=plugin_key, include_path=include_file_path)
-        # index schedules
-        schedules = include_file_contents.get("schedules", [])
-        for schedule in schedules:
-            schedule_key = ("schedules", schedule["name"])
-            self._add_to_index(key=schedule_key, include_path=include_file_path)
-        # index environments
-        environments = include_file_contents.get("environments", [])
-        for environment in environments:
-            environment_key = ("environments", environment["name"])
-            self._add_to_index(key=environment_key, include_path=include_file_path)
+        if "plugins" in include_file_contents:
+            plugin_index = self._index["plugins"]
+            for plugin_type, plugins in include_file_contents["plugins"].items():
+                file_map = plugin_index.get(plugin_type)
+                if file_map is None:
+                    file_map = plugin_index[plugin_type] = {}
+                key_prefix = f"plugins:{plugin_type}"
+                for plugin in plugins:
+                    self._add_to_index(
+                        file_map, key_prefix, plugin["name"], include_path
+                    )
+        # index schedules and environments
+        for key in ("schedules", "environments"):
+            if key not in include_file_contents:
+                continue
+            file_map = self._index[key]
+            for entry in include_file_contents[key]:
+                self._add_to_index(file_map, key, entry["name"], include_path)
 
     def _load_included_files(self):
         """Read and index included files."""
-        self._plugin_file_map = {}
+        self._index = self._empty_index()
+        include_paths = self.include_paths
+        self._loaded_include_paths = include_paths
+        self._blank_files = set()
         included_file_contents = []
-        for path in self.include_paths:
+        for path in include_paths:
             try:
-                with path.open() as file:
-                    contents = yaml.safe_load(file)
-                    # TODO: validate dict schema (https://gitlab.com/meltano/meltano/-/issues/3029)
-                    self._index_file(
-                        include_file_path=path, include_file_contents=contents
-                    )
-                    included_file_contents.append(contents)
+                contents = _fast_load(path)
             except yaml.YAMLError as exc:
                 logger.critical(f"Error while parsing YAML file: {path} \n {exc}")
                 raise exc
+            # TODO: validate dict schema (https://gitlab.com/meltano/meltano/-/issues/3029)
+            self._index_file(include_file_path=path, include_file_contents=contents)
+            if contents == BLANK_SUBFILE:
+                self._blank_files.add(path)
+            included_file_contents.append(contents)
         return included_file_contents
 
     @staticmethod
-    def _add_plugin(file_dicts, file, plugin_type, plugin):
-        file_dict = file_dicts.setdefault(file, {})
-        plugins_dict = file_dict.setdefault("plugins", {})
-        plugins = plugins_dict.setdefault(plugin_type, [])
-        if plugin["name"] not in {plg["name"] for plg in plugins}:
+    def _add_plugin(file_dicts, added, file, plugin_type, plugin):
+        key = (file, plugin_type)
+        if key not in added:
+            file_dict = file_dicts.setdefault(file, {})
+            plugins_dict = file_dict.setdefault("plugins", {})
+            added[key] = (plugins_dict.setdefault(plugin_type, []), set())
+        plugins, names = added[key]
+        if plugin["name"] not in names:
+            names.add(plugin["name"])
             plugins.append(plugin)
 
     @staticmethod
-    def _add_schedule(file_dicts, file, schedule):
-        file_dict = file_dicts.setdefault(file, {})
-        schedules = file_dict.setdefault("schedules", [])
-        if schedule["name"] not in {scd["name"] for scd in schedules}:
+    def _add_schedule(file_dicts, added, file, schedule):
+        if file not in added:
+            file_dict = file_dicts.setdefault(file, {})
+            added[file] = (file_dict.setdefault("schedules", []), set())
+        schedules, names = added[file]
+        if schedule["name"] not in names:
+            names.add(schedule["name"])
             schedules.append(schedule)
 
     @staticmethod
-    def _add_environment(file_dicts, file, environment):
-        file_dict = file_dicts.setdefault(file, {})
-        environments = file_dict.setdefault("environments", [])
-        if environment["name"] not in {env["name"] for env in environments}:
+    def _add_environment(file_dicts, added, file, environment):
+        if file not in added:
+            file_dict = file_dicts.setdefault(file, {})
+            added[file] = (file_dict.setdefault("environments", []), set())
+        environments, names = added[file]
+        if environment["name"] not in names:
+            names.add(environment["name"])
             environments.append(environment)
 
     def _add_plugins(self, file_dicts, all_plugins):
+        # list in `file_dicts` for each (file, plugin type), and the names in it
+        added = {}
         for plugin_type, plugins in all_plugins.items():
             plugin_type = str(plugin_type)
+            file_map = self._index["plugins"].get(plugin_type, {})
             for plugin in plugins:
-                key = ("plugins", plugin_type, plugin.get("name"))
-                file = self._plugin_file_map.get(key, str(self._meltano_file_path))
-                self._add_plugin(file_dicts, file, plugin_type, plugin)
+                file = file_map.get(plugin.get("name"), self._meltano_file_path_str)
+                self._add_plugin(file_dicts, added, file, plugin_type, plugin)
 
     def _add_schedules(self, file_dicts, schedules):
+        # list in `file_dicts` for each file, and the names in it
+        added = {}
+        file_map = self._index["schedules"]
         for schedule in schedules:
-            key = ("schedules", schedule["name"])
-            file = self._plugin_file_map.get(key, str(self._meltano_file_path))
-            self._add_schedule(file_dicts, file, schedule)
+            file = file_map.get(schedule["name"], self._meltano_file_path_str)
+            self._add_schedule(file_dicts, added, file, schedule)
 
     def _add_environments(self, file_dicts, environments):
+        # list in `file_dicts` for each file, and the names in it
+        added = {}
+        file_map = self._index["environments"]
         for environment in environments:
-            key = ("environments", environment["name"])
-            file = self._plugin_file_map.get(key, str(self._meltano_file_path))
-            self._add_environment(file_dicts, file, environment)
+            file = file_map.get(environment["name"], self._meltano_file_path_str)
+            self._add_environment(file_dicts, added, file, environment)
 
     def _split_config_dict(self, config: dict):
         file_dicts = {}
+        # keys that may be split out into included files, and how to do so
+        add_entries = {
+            "plugins": self._add_plugins,
+            "schedules": self._add_schedules,
+            "environments": self._add_environments,
+        }
         for key, value in config.items():
-            if key == "plugins":
-                self._add_plugins(file_dicts, value)
-            elif key == "schedules":
-                self._add_schedules(file_dicts, value)
-            elif key == "environments":
-                self._add_environments(file_dicts, value)
+            add = add_entries.get(key)
+            if add:
+                add(file_dicts, value)
             else:
-                file = str(self._meltano_file_path)
+                file = self._meltano_file_path_str
                 file_dict = file_dicts.setdefault(file, {})
                 file_dict[key] = value
         return file_dicts
 
     @staticmethod
-    def _write_file(file_path, contents):
+    def _dump_if_changed(file_path, contents) -> Optional[str]:
+        """Dump `contents` to YAML, or return `None` if the file already holds it.
+
+        Skipping unchanged files saves their write (and its fsync), and keeps
+        their mtime.
+        """
+        dumped = yaml.dump(contents, default_flow_style=False, sort_keys=False)
+        try:
+            if Path(file_path).read_text() == dumped:
+                return None
+        except (OSError, UnicodeDecodeError):
+            pass
+        return dumped
+
+    @staticmethod
+    def _write_file(file_path, dumped: str):
         with atomic_write(file_path, overwrite=True) as fl:
-            yaml.dump(contents, fl, default_flow_style=False, sort_keys=False)
+            fl.write(dumped)
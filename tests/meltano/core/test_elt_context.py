@@ -59,14 +59,14 @@ def assert_transformer_env(transformer, env):
 
 
 class TestELTContext:
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def target_postgres(self, project_add_service):
         try:
             return project_add_service.add(PluginType.LOADERS, "target-postgres")
         except PluginAlreadyAddedException as err:
             return err.plugin
 
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def tap_mock_transform(self, project_add_service):
         try:
             return project_add_service.add(PluginType.TRANSFORMS, "tap-mock-transform")
@@ -118,6 +118,24 @@ class TestPluginDiscoveryService:
                 PluginType.EXTRACTORS, "tap-mock", variant="unknown"
             )
 
+    def test_find_related_plugin_refs(self, subject):
+        target_plugin = ProjectPlugin(
+            PluginType.EXTRACTORS, "tap-mock", namespace="tap_mock"
+        )
+
+        related_plugin_refs = subject.find_related_plugin_refs(target_plugin)
+        assert {(ref.type, ref.name) for ref in related_plugin_refs} == {
+            (PluginType.TRANSFORMS, "tap-mock-transform")
+        }
+
+        plugin_types = [PluginType.EXTRACTORS, PluginType.TRANSFORMS]
+        related_plugin_refs = subject.find_related_plugin_refs(
+            target_plugin, plugin_types=plugin_types
+        )
+        assert [ref.name for ref in related_plugin_refs] == ["tap-mock-transform"]
+        # the plugin types passed in are left untouched
+        assert plugin_types == [PluginType.EXTRACTORS, PluginType.TRANSFORMS]
+
     def test_get_base_plugin(self, subject):
         # If no variant is set on the project plugin,
         # defaults to the original variant
@@ -5,10 +5,13 @@ import platform
 import tempfile
 from pathlib import Path
 
+import mock
 import pytest  # noqa: F401
 import yaml
 from jsonschema import validate
 
+from meltano.core.project_files import ProjectFiles, deep_merge
+
 
 @pytest.fixture
 def cd_temp_subdir():
@@ -280,3 +283,170 @@ class TestProjectFiles:
         }
         read_result = project_files.load()
         assert read_result == expected_result
+
+    def test_load_empty_include_file(self, project_files):
+        expected_result = project_files.load()
+        empty_file_path = project_files.root / "subconfig_3.yml"
+        empty_file_path.write_text("# nothing to include here yet\n")
+        try:
+            assert empty_file_path in project_files.include_paths
+            assert project_files.load() == expected_result
+        finally:
+            empty_file_path.unlink()
+
+    def test_load_after_meltano_file_changed(self, project_files):
+        meltano_file_path = project_files.root / "meltano.yml"
+        original_contents = meltano_file_path.read_text()
+        version = project_files.load()["version"]
+
+        meltano_file_path.write_text(
+            original_contents.replace(f"version: {version}", "version: 99")
+        )
+        try:
+            assert project_files.load()["version"] == 99
+        finally:
+            meltano_file_path.write_text(original_contents)
+        assert project_files.load()["version"] == version
+
+    def test_load_after_include_file_added(self, project_files):
+        project_files.load()
+
+        new_file_path = project_files.root / "subconfig_7.yml"
+        new_file_path.write_text("plugins:\n  extractors:\n  - name: tap-new\n")
+        try:
+            meltano_config = project_files.load()
+            assert {"name": "tap-new"} in meltano_config["plugins"]["extractors"]
+
+            project_files.update(meltano_config)
+            meltano_config = project_files.load()
+            assert {"name": "tap-new"} in meltano_config["plugins"]["extractors"]
+        finally:
+            new_file_path.unlink()
+
+        meltano_config = project_files.load()
+        assert {"name": "tap-new"} not in meltano_config["plugins"]["extractors"]
+
+    def test_try_shallow_glob(self, tmp_path):
+        project_files = ProjectFiles(tmp_path, tmp_path / "meltano.yml")
+        plugins_dir = tmp_path / "plugins"
+        for name in ("extractors", "loaders", "empty"):
+            (plugins_dir / name).mkdir(parents=True)
+        (plugins_dir / "extractors" / "plugins.yml").touch()
+        (plugins_dir / "loaders" / "plugins.yml").touch()
+        (plugins_dir / "mappers.yml").touch()
+        (tmp_path / "subfolder").mkdir()
+        (tmp_path / "subfolder" / "subconfig_1.yml").touch()
+
+        for pattern in (
+            "plugins/*/plugins.yml",
+            "./plugins/*/plugins.yml",
+            "plugins/*.yml",
+            "plugins/*",
+            "*/subconfig_1.yml",
+            "missing/*/plugins.yml",
+        ):
+            paths = project_files._try_shallow_glob(pattern)
+            assert sorted(path for path, _ in paths) == sorted(
+                project_files.root.glob(pattern)
+            )
+            assert all(is_file == path.is_file() for path, is_file in paths)
+
+        for pattern in ("./*/**/subconfig_[0-9].yml", "*/*.yml", "plugins/?.yml"):
+            assert project_files._try_shallow_glob(pattern) is None
+
+    def test_deep_merge(self):
+        parent = {
+            "version": 1,
+            "plugins": {"extractors": [{"name": "tap-parent", "config": {"a": 1}}]},
+        }
+        children = [
+            {"plugins": {"extractors": [{"name": "tap-child"}]}, "version": 2},
+            {"plugins": {"loaders": [{"name": "target-child"}]}},
+        ]
+
+        merged = deep_merge(parent, children)
+        assert merged == {
+            "version": 2,
+            "plugins": {
+                "extractors": [
+                    {"name": "tap-parent", "config": {"a": 1}},
+                    {"name": "tap-child"},
+                ],
+                "loaders": [{"name": "target-child"}],
+            },
+        }
+
+        merged["plugins"]["extractors"][0]["config"]["a"] = 2
+        assert parent == {
+            "version": 1,
+            "plugins": {"extractors": [{"name": "tap-parent", "config": {"a": 1}}]},
+        }
+
+    def test_update_blanks_unused_files(self, project_files):
+        meltano_config = project_files.load()
+        for plugin_type in ("extractors", "loaders"):
+            meltano_config["plugins"][plugin_type] = [
+                plugin
+                for plugin in meltano_config["plugins"][plugin_type]
+                if "subconfig-1" not in plugin["name"]
+            ]
+        for key in ("schedules", "environments"):
+            meltano_config[key] = [
+                entry
+                for entry in meltano_config[key]
+                if entry["name"] != "test-subconfig-1-yml"
+            ]
+
+        subconfig_path = project_files.root / "subfolder" / "subconfig_1.yml"
+        original_contents = subconfig_path.read_text()
+        try:
+            project_files.update(meltano_config)
+            assert yaml.safe_load(subconfig_path.read_text()) == {
+                "plugins": {},
+                "schedules": [],
+            }
+            assert project_files.load() == meltano_config
+
+            # files loaded blank aren't blanked again
+            with mock.patch.object(
+                project_files,
+                "_dump_if_changed",
+                wraps=project_files._dump_if_changed,
+            ) as dump_if_changed:
+                project_files.update(meltano_config)
+            dumped_paths = [call.args[0] for call in dump_if_changed.call_args_list]
+            assert subconfig_path not in dumped_paths
+        finally:
+            subconfig_path.write_text(original_contents)
+
+    def test_update_keeps_include_file_added_after_load(self, project_files):
+        meltano_config = project_files.load()
+
+        new_file_path = project_files.root / "subconfig_8.yml"
+        new_file_path.write_text("plugins:\n  extractors:\n  - name: tap-new\n")
+        try:
+            project_files.update(meltano_config)
+            assert yaml.safe_load(new_file_path.read_text()) == {
+                "plugins": {"extractors": [{"name": "tap-new"}]}
+            }
+        finally:
+            new_file_path.unlink()
+
+    def test_update_skips_unchanged_files(self, project_files):
+        meltano_config = project_files.load()
+        project_files.update(meltano_config)
+
+        meltano_file_path = project_files.root / "meltano.yml"
+        original_contents = meltano_file_path.read_text()
+        meltano_mtime_ns = meltano_file_path.stat().st_mtime_ns
+        subconfig_path = project_files.root / "subconfig_2.yml"
+        subconfig_mtime_ns = subconfig_path.stat().st_mtime_ns
+        meltano_config["version"] += 1
+        try:
+            project_files.update(meltano_config)
+
+            assert meltano_file_path.stat().st_mtime_ns != meltano_mtime_ns
+            assert subconfig_path.stat().st_mtime_ns == subconfig_mtime_ns
+            assert project_files.load() == meltano_config
+        finally:
+            meltano_file_path.write_text(original_contents)